@@ -1,150 +1,342 @@
+import os
+import threading
 import streamlit as st
 import sqlite3
 import pandas as pd
+from contextlib import contextmanager
 from datetime import date
 
 DB_NAME = "inventory.db"
+PAGE_SIZE = 500
+
+# Schema setup, applied as one transaction by init_db()
+SCHEMA_SQL = """
+BEGIN IMMEDIATE;
+
+CREATE TABLE IF NOT EXISTS items (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    category TEXT,
+    brand TEXT,
+    unit TEXT DEFAULT 'pcs',
+    cost_price REAL DEFAULT 0,
+    sale_price REAL DEFAULT 0,
+    active INTEGER DEFAULT 1,
+    notes TEXT
+);
+
+CREATE TABLE IF NOT EXISTS parties (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    type TEXT CHECK(type IN ('supplier','customer')) NOT NULL,
+    name TEXT NOT NULL,
+    phone TEXT,
+    address TEXT
+);
+
+CREATE TABLE IF NOT EXISTS transactions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    item_id INTEGER NOT NULL,
+    txn_type TEXT CHECK(txn_type IN ('IN','OUT','ADJUST')) NOT NULL,
+    qty REAL NOT NULL,
+    unit_price REAL,
+    party_id INTEGER,
+    ref_no TEXT,
+    txn_date TEXT NOT NULL,
+    remarks TEXT,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY(item_id) REFERENCES items(id) ON DELETE CASCADE,
+    FOREIGN KEY(party_id) REFERENCES parties(id) ON DELETE SET NULL
+);
+
+CREATE INDEX IF NOT EXISTS ix_tx_item ON transactions(item_id);
+DROP INDEX IF EXISTS ix_tx_created;  -- recent transactions walk the rowid instead
+-- The old SELECT-then-INSERT upsert could race into duplicate parties; fold
+-- them onto the oldest id so the unique index below can be created.
+UPDATE transactions
+   SET party_id = (SELECT MIN(p2.id) FROM parties p1
+                     JOIN parties p2 ON p2.type = p1.type AND p2.name = p1.name
+                    WHERE p1.id = transactions.party_id)
+ WHERE party_id NOT IN (SELECT MIN(id) FROM parties GROUP BY type, name);
+DELETE FROM parties WHERE id NOT IN (SELECT MIN(id) FROM parties GROUP BY type, name);
+CREATE UNIQUE INDEX IF NOT EXISTS ux_party ON parties(type, name);
+CREATE INDEX IF NOT EXISTS ix_items_category ON items(category) WHERE active=1;
+
+-- Running stock per item, kept in step with transactions by the triggers below
+CREATE TABLE IF NOT EXISTS stock (
+    item_id INTEGER PRIMARY KEY,
+    qty REAL NOT NULL DEFAULT 0,
+    FOREIGN KEY(item_id) REFERENCES items(id) ON DELETE CASCADE
+);
+
+CREATE TRIGGER IF NOT EXISTS trg_stock_in AFTER INSERT ON transactions
+WHEN NEW.txn_type = 'IN' BEGIN
+    INSERT INTO stock(item_id, qty) VALUES(NEW.item_id, NEW.qty)
+    ON CONFLICT(item_id) DO UPDATE SET qty = qty + excluded.qty;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_stock_out AFTER INSERT ON transactions
+WHEN NEW.txn_type = 'OUT' BEGIN
+    INSERT INTO stock(item_id, qty) VALUES(NEW.item_id, -NEW.qty)
+    ON CONFLICT(item_id) DO UPDATE SET qty = qty + excluded.qty;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_stock_adjust AFTER INSERT ON transactions
+WHEN NEW.txn_type = 'ADJUST' BEGIN
+    INSERT INTO stock(item_id, qty) VALUES(NEW.item_id, NEW.qty)
+    ON CONFLICT(item_id) DO UPDATE SET qty = qty + excluded.qty;
+END;
+
+-- Deletes/edits made outside the app (e.g. in a DB browser) keep stock in step too
+CREATE TRIGGER IF NOT EXISTS trg_stock_delete AFTER DELETE ON transactions BEGIN
+    UPDATE stock SET qty = qty - (CASE WHEN OLD.txn_type='OUT' THEN -OLD.qty ELSE OLD.qty END)
+     WHERE item_id = OLD.item_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_stock_update AFTER UPDATE OF item_id, txn_type, qty ON transactions BEGIN
+    UPDATE stock SET qty = qty - (CASE WHEN OLD.txn_type='OUT' THEN -OLD.qty ELSE OLD.qty END)
+     WHERE item_id = OLD.item_id;
+    INSERT INTO stock(item_id, qty) VALUES(NEW.item_id, CASE WHEN NEW.txn_type='OUT' THEN -NEW.qty ELSE NEW.qty END)
+    ON CONFLICT(item_id) DO UPDATE SET qty = qty + excluded.qty;
+END;
+
+-- Backfill once for databases that predate the stock table
+INSERT INTO stock(item_id, qty)
+SELECT item_id, SUM(CASE WHEN txn_type='OUT' THEN -qty ELSE qty END)
+  FROM transactions
+ WHERE NOT EXISTS (SELECT 1 FROM stock)
+ GROUP BY item_id;
+
+COMMIT;
+"""
+
+# Hot queries live here as constants: sqlite3 caches compiled statements per
+# connection keyed on the SQL text, so reusing the exact same string on the
+# shared connection skips re-parsing on every rerun.
+SQL_ITEMS = """
+SELECT id, name, category, brand, unit, cost_price, sale_price, active
+FROM items
+WHERE active=1 OR NOT :active_only
+"""
+
+SQL_CATEGORIES = """
+SELECT DISTINCT category FROM items
+WHERE active=1 AND category IS NOT NULL
+ORDER BY category;
+"""
+
+SQL_INVENTORY = """
+SELECT
+    i.id, i.name, i.category, i.brand, i.unit,
+    i.cost_price, i.sale_price,
+    COALESCE(s.qty, 0) AS stock_qty
+FROM items i
+LEFT JOIN stock s ON s.item_id = i.id
+WHERE i.active=1 AND (:category IS NULL OR i.category = :category)
+  AND (:search IS NULL
+       OR i.name LIKE :search ESCAPE '\\'
+       OR i.brand LIKE :search ESCAPE '\\'
+       OR i.category LIKE :search ESCAPE '\\')
+ORDER BY i.name;
+"""
+
+SQL_PARTIES = "SELECT id, name FROM parties WHERE type=? ORDER BY name;"
+
+# The no-op DO UPDATE keeps existing parties untouched but still RETURNs their id
+SQL_UPSERT_PARTY = """
+INSERT INTO parties(type, name, phone, address) VALUES(?,?,?,?)
+ON CONFLICT(type, name) DO UPDATE SET name=excluded.name
+RETURNING id;
+"""
+
+SQL_RECENT_TX = """
+SELECT t.txn_date, t.txn_type, i.name AS item, t.qty, t.unit_price, t.ref_no, t.remarks
+FROM transactions t
+JOIN items i ON i.id = t.item_id
+ORDER BY t.id DESC
+LIMIT 200;
+"""
+
+SQL_INSERT_TXN = """
+INSERT INTO transactions(item_id, txn_type, qty, unit_price, party_id, ref_no, txn_date, remarks)
+VALUES(:item_id, :txn_type, :qty, :unit_price, :party_id, :ref_no, :txn_date, :remarks)
+"""
+TXN_FIELDS = ("item_id", "txn_type", "qty", "unit_price", "party_id", "ref_no", "txn_date", "remarks")
 
 # =============== DB Helpers ===============
+@st.cache_resource
 def get_conn():
-    return sqlite3.connect(DB_NAME, check_same_thread=False)
+    """One shared connection so SQLite's page cache survives across reruns."""
+    # Autocommit: reads never open a transaction; writes BEGIN explicitly in write_txn().
+    con = sqlite3.connect(DB_NAME, check_same_thread=False, isolation_level=None)
+    con.execute("PRAGMA temp_store=MEMORY")
+    con.execute("PRAGMA cache_size=-20000")
+    return con
+
+@st.cache_resource
+def get_db_lock():
+    """Guards every use of the shared connection, reads included.
+
+    Without it one session's statements could land inside (or commit, or read
+    the uncommitted rows of) another session's open transaction.
+    """
+    return threading.Lock()
 
-def init_db():
+@contextmanager
+def write_txn():
+    """Run the enclosed writes as one transaction on the shared connection."""
     con = get_conn()
+    with get_db_lock():
+        with con:
+            con.execute("BEGIN")
+            yield con
+        bump_db_version()
+
+def read_sql(sql:str, params=None):
+    with get_db_lock():
+        return pd.read_sql_query(sql, get_conn(), params=params)
+
+def db_version():
+    """Cache key for the read helpers; changes whenever the DB is written."""
+    # In WAL mode writes land in the -wal file until a checkpoint, so watch both.
+    mtimes = tuple(os.path.getmtime(p) for p in (DB_NAME, DB_NAME + "-wal") if os.path.exists(p))
+    return mtimes, get_db_state()["version"]
+
+@st.cache_resource
+def get_db_state():
+    # Process-wide, like the cache it keys, so every session sees the same version
+    return {"version": 0}
+
+def bump_db_version():
+    get_db_state()["version"] += 1
+
+@st.cache_resource
+def init_db():
+    """Create/migrate the schema once per process, not on every rerun."""
+    with get_db_lock():
+        _init_db(get_conn())
+
+def _init_db(con):
     cur = con.cursor()
-    cur.executescript("""
-    PRAGMA foreign_keys = ON;
-
-    CREATE TABLE IF NOT EXISTS items (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT NOT NULL,
-        category TEXT,
-        brand TEXT,
-        unit TEXT DEFAULT 'pcs',
-        cost_price REAL DEFAULT 0,
-        sale_price REAL DEFAULT 0,
-        active INTEGER DEFAULT 1,
-        notes TEXT
-    );
-
-    CREATE TABLE IF NOT EXISTS parties (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        type TEXT CHECK(type IN ('supplier','customer')) NOT NULL,
-        name TEXT NOT NULL,
-        phone TEXT,
-        address TEXT
-    );
-
-    CREATE TABLE IF NOT EXISTS transactions (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        item_id INTEGER NOT NULL,
-        txn_type TEXT CHECK(txn_type IN ('IN','OUT','ADJUST')) NOT NULL,
-        qty REAL NOT NULL,
-        unit_price REAL,
-        party_id INTEGER,
-        ref_no TEXT,
-        txn_date TEXT NOT NULL,
-        remarks TEXT,
-        created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY(item_id) REFERENCES items(id) ON DELETE CASCADE,
-        FOREIGN KEY(party_id) REFERENCES parties(id) ON DELETE SET NULL
-    );
-    """)
-    con.commit()
-    con.close()
+    # WAL lets dashboard reads run alongside IN/OUT writes instead of blocking them.
+    cur.execute("PRAGMA journal_mode=WAL")
+    cur.execute("PRAGMA synchronous=NORMAL")
+    cur.execute("PRAGMA wal_autocheckpoint=1000")
+    cur.execute("PRAGMA busy_timeout=5000")
+    cur.execute("PRAGMA foreign_keys = ON")
+    # One transaction, so the stock triggers and their backfill land together
+    try:
+        cur.executescript(SCHEMA_SQL)
+    except sqlite3.Error:
+        if con.in_transaction:
+            con.rollback()
+        raise
 
 def get_items_df(active_only=True):
-    con = get_conn()
-    q = "SELECT * FROM items" + (" WHERE active=1" if active_only else "")
-    df = pd.read_sql_query(q, con)
-    con.close()
+    return _get_items_df(active_only, db_version())
+
+@st.cache_data(show_spinner=False, max_entries=10)
+def _get_items_df(active_only, version):
+    df = read_sql(SQL_ITEMS, params={"active_only": int(active_only)})
+    return df.astype({"id": "int32"})
+
+def get_inventory_df(category=None, search=None):
+    return _get_inventory_df(category, search or None, db_version())
+
+@st.cache_data(show_spinner=False, max_entries=100)
+def _get_inventory_df(category, search, version):
+    if search is not None:
+        # Substring match on name/brand/category; escape LIKE wildcards typed by the user
+        search = "%" + search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+    df = read_sql(SQL_INVENTORY, params={"category": category, "search": search})
+    # Ids and whole-unit quantities fit in 32 bits; prices stay float64 so PKR
+    # amounts and their totals keep full precision.
+    df = df.astype({"id": "int32", "stock_qty": "float32", "cost_price": "float64", "sale_price": "float64"})
+    df["stock_value_cost"] = (df["stock_qty"] * df["cost_price"]).round(2)
     return df
 
-def get_inventory_df():
-    con = get_conn()
-    q = """
-    SELECT 
-        i.id, i.name, i.category, i.brand, i.unit,
-        i.cost_price, i.sale_price,
-        COALESCE(SUM(
-            CASE 
-                WHEN t.txn_type='IN' THEN t.qty
-                WHEN t.txn_type='OUT' THEN -t.qty
-                WHEN t.txn_type='ADJUST' THEN t.qty
-                ELSE 0
-            END
-        ), 0) AS stock_qty
-    FROM items i
-    LEFT JOIN transactions t ON t.item_id = i.id
-    WHERE i.active=1
-    GROUP BY i.id
-    ORDER BY i.name;
-    """
-    df = pd.read_sql_query(q, con)
-    con.close()
-    if not df.empty:
-        df["stock_value_cost"] = (df["stock_qty"] * df["cost_price"]).round(2)
-    return df
+def get_inventory_csv():
+    return _get_inventory_csv(db_version())
+
+@st.cache_data(show_spinner=False, max_entries=10)
+def _get_inventory_csv(version):
+    # Rendered once per DB version instead of on every rerun of the Reports tab
+    return _get_inventory_df(None, None, version).to_csv(index=False).encode()
+
+def get_categories():
+    return _get_categories(db_version())
+
+@st.cache_data(show_spinner=False, max_entries=10)
+def _get_categories(version):
+    with get_db_lock():
+        return [row[0] for row in get_conn().execute(SQL_CATEGORIES)]
 
 def upsert_party(party_type:str, name:str, phone:str=None, address:str=None):
     if not (name or "").strip():
         return None
-    con = get_conn()
-    cur = con.cursor()
-    cur.execute("SELECT id FROM parties WHERE type=? AND name=?;", (party_type, name.strip()))
-    row = cur.fetchone()
-    if row:
-        pid = row[0]
-    else:
-        cur.execute("INSERT INTO parties(type,name,phone,address) VALUES(?,?,?,?)",
-                    (party_type, name.strip(), phone, address))
-        pid = cur.lastrowid
-        con.commit()
-    con.close()
+    with write_txn() as con:
+        pid = con.execute(SQL_UPSERT_PARTY, (party_type, name.strip(), phone, address)).fetchone()[0]
     return pid
 
 def list_parties(party_type:str):
-    con = get_conn()
-    df = pd.read_sql_query("SELECT id, name FROM parties WHERE type=? ORDER BY name;", con, params=(party_type,))
-    con.close()
+    return _list_parties(party_type, db_version())
+
+@st.cache_data(show_spinner=False, max_entries=10)
+def _list_parties(party_type, version):
+    df = read_sql(SQL_PARTIES, params=(party_type,))
     if df.empty:
         df = pd.DataFrame(columns=["id","name"])
     return df
 
 def add_item(**kwargs):
-    con = get_conn()
-    cur = con.cursor()
-    cur.execute("""
-        INSERT INTO items(name, category, brand, unit, cost_price, sale_price, notes)
-        VALUES(:name, :category, :brand, :unit, :cost_price, :sale_price, :notes)
-    """, kwargs)
-    con.commit()
-    con.close()
+    with write_txn() as con:
+        con.execute("""
+            INSERT INTO items(name, category, brand, unit, cost_price, sale_price, notes)
+            VALUES(:name, :category, :brand, :unit, :cost_price, :sale_price, :notes)
+        """, kwargs)
 
 def update_item_basic(item_id:int, cost_price:float=None, sale_price:float=None):
-    con = get_conn()
-    cur = con.cursor()
-    cur.execute("""
-        UPDATE items 
-           SET cost_price = COALESCE(?, cost_price),
-               sale_price = COALESCE(?, sale_price)
-         WHERE id=?;
-    """, (cost_price, sale_price, item_id))
-    con.commit()
-    con.close()
+    with write_txn() as con:
+        con.execute("""
+            UPDATE items 
+               SET cost_price = COALESCE(?, cost_price),
+                   sale_price = COALESCE(?, sale_price)
+             WHERE id=?;
+        """, (cost_price, sale_price, item_id))
 
 def record_txn(item_id:int, txn_type:str, qty:float, unit_price:float=None, party_id:int=None,
                ref_no:str=None, txn_date:str=None, remarks:str=None):
-    if qty <= 0:
-        raise ValueError("Qty must be > 0")
-    con = get_conn()
-    cur = con.cursor()
-    cur.execute("""
-        INSERT INTO transactions(item_id, txn_type, qty, unit_price, party_id, ref_no, txn_date, remarks)
-        VALUES(?,?,?,?,?,?,?,?)
-    """, (item_id, txn_type, qty, unit_price, party_id, ref_no, txn_date or date.today().isoformat(), remarks))
-    con.commit()
-    con.close()
+    record_txns([dict(item_id=item_id, txn_type=txn_type, qty=qty, unit_price=unit_price, party_id=party_id,
+                      ref_no=ref_no, txn_date=txn_date, remarks=remarks)])
+
+def record_txns(rows):
+    """Insert many transactions in one transaction; each row is a dict of record_txn's arguments."""
+    today = date.today().isoformat()
+    params = []
+    for row in rows:
+        p = {f: row.get(f) for f in TXN_FIELDS}
+        if p["qty"] is None or p["qty"] <= 0:
+            raise ValueError("Qty must be > 0")
+        p["txn_date"] = p["txn_date"] or today
+        params.append(p)
+    with write_txn() as con:
+        con.executemany(SQL_INSERT_TXN, params)
+
+# =============== UI Helpers ===============
+def paginate(df, key:str, page_size:int=PAGE_SIZE):
+    """Return one page of df so only the visible rows are sent to the browser."""
+    pages = max(1, -(-len(df) // page_size))
+    if pages == 1:
+        return df
+    page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, step=1, key=key)
+    start = (int(page) - 1) * page_size
+    return df.iloc[start:start + page_size]
+
+def load_shared():
+    """Frames shared by the tabs; reloaded after each write so later tabs see it."""
+    items_df = get_items_df()
+    # First row per name, like the old mask-then-iloc[0] lookups
+    items_by_name = items_df.drop_duplicates("name").set_index("name", drop=False)
+    return items_df, items_by_name, get_inventory_df(), list_parties("supplier"), list_parties("customer")
 
 # =============== UI ===============
 st.set_page_config(page_title="Ali Mobile Repairing Center - Inventory", page_icon="📱", layout="wide")
@@ -154,8 +346,7 @@ init_db()
 
 with st.sidebar:
     st.markdown("### Filters")
-    items_df_side = get_items_df()
-    categories = ["All"] + (sorted(items_df_side["category"].dropna().unique().tolist()) if not items_df_side.empty else [])
+    categories = ["All"] + get_categories()
     selected_cat = st.selectbox("Category", categories, index=0)
     st.markdown("---")
     st.caption("Use tabs to manage items and stock.")
@@ -164,13 +355,15 @@ tab_dash, tab_items, tab_in, tab_out, tab_inv, tab_parties = st.tabs(
     ["Dashboard", "Items", "Stock IN (Purchase)", "Stock OUT (Sale/Issue)", "Inventory & Reports", "Parties"]
 )
 
+# Load each frame once per rerun and share it across the tabs below
+items_df, items_by_name, inv_df, suppliers_df, customers_df = load_shared()
+
 # =============== Dashboard ===============
 with tab_dash:
-    inv_df = get_inventory_df()
-    if inv_df is None or inv_df.empty:
+    inv_filtered = inv_df if selected_cat == "All" else get_inventory_df(category=selected_cat)
+    if inv_filtered.empty:
         st.info("No items yet. Please add items in the 'Items' tab.")
     else:
-        inv_filtered = inv_df if selected_cat == "All" else inv_df[inv_df["category"].fillna("") == selected_cat]
         total_items = len(inv_filtered)
         total_qty = float(inv_filtered["stock_qty"].sum()) if total_items else 0
         total_value = float(inv_filtered["stock_value_cost"].sum()) if total_items else 0
@@ -182,16 +375,11 @@ with tab_dash:
 
         st.markdown("#### Quick Search")
         q = st.text_input("Search item (name/brand/category)", "")
-        df_show = inv_filtered.copy()
+        df_show = inv_filtered
         if q.strip():
-            ql = q.strip().lower()
-            df_show = df_show[
-                df_show.apply(lambda r: any(
-                    ql in str(r[col]).lower() for col in ["name","brand","category"]
-                ), axis=1)
-            ]
+            df_show = get_inventory_df(category=None if selected_cat == "All" else selected_cat, search=q.strip())
         st.dataframe(
-            df_show[["name","category","brand","unit","stock_qty","cost_price","sale_price","stock_value_cost"]]
+            paginate(df_show, "dash_page")[["name","category","brand","unit","stock_qty","cost_price","sale_price","stock_value_cost"]]
             .rename(columns={"stock_qty":"In Stock","stock_value_cost":"Stock Value"}),
             use_container_width=True,
             hide_index=True
@@ -223,40 +411,39 @@ with tab_items:
                     sale_price=float(sale_price), notes=(notes.strip() or None)
                 )
                 st.success(f"Item '{name}' added.")
+                items_df, items_by_name, inv_df, suppliers_df, customers_df = load_shared()
 
     st.markdown("---")
     st.subheader("Update Price")
-    items_df_update = get_items_df()
-    if items_df_update.empty:
+    if items_df.empty:
         st.info("No items to update.")
     else:
         col1, col2, col3 = st.columns(3)
-        sel_item_name = col1.selectbox("Select Item", items_df_update["name"].tolist())
-        item_row = items_df_update[items_df_update["name"] == sel_item_name].iloc[0]
+        sel_item_name = col1.selectbox("Select Item", items_df["name"].tolist())
+        item_row = items_by_name.loc[sel_item_name]
         
         cost_new = col2.number_input("Cost Price (PKR)", min_value=0.0, value=float(item_row["cost_price"] or 0.0), step=1.0, key=f"cost_{item_row['id']}")
         sale_new = col3.number_input("Sale Price (PKR)", min_value=0.0, value=float(item_row["sale_price"] or 0.0), step=1.0, key=f"sale_{item_row['id']}")
         
         if st.button("Save Price Changes"):
-            update_item_basic(item_row['id'], cost_price=float(cost_new), sale_price=float(sale_new))
+            update_item_basic(int(item_row['id']), cost_price=float(cost_new), sale_price=float(sale_new))
             st.success("Item price updated.")
+            items_df, items_by_name, inv_df, suppliers_df, customers_df = load_shared()
 
 # =============== Stock IN ===============
 with tab_in:
     st.subheader("Stock IN (Purchase)")
-    items_df_in = get_items_df()
-    if items_df_in.empty:
+    if items_df.empty:
         st.info("Please add items first.")
     else:
         with st.form("stock_in_form", clear_on_submit=True):
             c1, c2 = st.columns([2,1])
-            item_sel_name = c1.selectbox("Item", items_df_in["name"].tolist())
-            item_row = items_df_in[items_df_in["name"] == item_sel_name].iloc[0]
+            item_sel_name = c1.selectbox("Item", items_df["name"].tolist())
+            item_row = items_by_name.loc[item_sel_name]
             qty = c2.number_input("Qty", min_value=1.0, value=1.0, step=1.0)
 
             c3, c4, c5 = st.columns(3)
-            supplier_options = list_parties("supplier")
-            supplier_name_sel = c3.selectbox("Supplier (optional)", [""] + supplier_options["name"].tolist())
+            supplier_name_sel = c3.selectbox("Supplier (optional)", [""] + suppliers_df["name"].tolist())
             supplier_new = c4.text_input("Or add new Supplier")
             unit_price = c5.number_input("Unit Cost (PKR)", min_value=0.0, value=float(item_row["cost_price"] or 0.0), step=1.0)
             
@@ -274,30 +461,25 @@ with tab_in:
                     txn_date=txn_date.isoformat(), remarks=remarks.strip() or None
                 )
                 st.success("Stock IN recorded.")
+                items_df, items_by_name, inv_df, suppliers_df, customers_df = load_shared()
 
 # =============== Stock OUT ===============
 with tab_out:
     st.subheader("Stock OUT (Sale/Issue)")
-    items_df_out = get_items_df()
-    if items_df_out.empty:
+    if items_df.empty:
         st.info("Please add items first.")
     else:
-        inv_df_out = get_inventory_df()
-        if inv_df_out is None:
-            inv_df_out = pd.DataFrame()
-
-        def curr_stock(iid: int) -> float:
-            row = inv_df_out[inv_df_out["id"] == iid]
-            return float(row["stock_qty"].values[0]) if not row.empty else 0.0
-
-        df_out = items_df_out.copy()
-        df_out["in_stock"] = df_out["id"].apply(curr_stock)
-        df_out["label"] = df_out.apply(lambda r: f"{r['name']} [In Stock: {int(r['in_stock'])}]", axis=1)
+        df_out = items_df.merge(
+            inv_df[["id","stock_qty"]], on="id", how="left"
+        ).rename(columns={"stock_qty":"in_stock"})
+        df_out["in_stock"] = df_out["in_stock"].fillna(0.0)
+        df_out["label"] = df_out["name"].astype(str) + " [In Stock: " + df_out["in_stock"].astype("int32").astype(str) + "]"
+        out_by_name = df_out.drop_duplicates("name").set_index("name", drop=False)
         
         with st.form("stock_out_form", clear_on_submit=True):
             sel_label = st.selectbox("Item", df_out["label"].tolist())
             item_name = sel_label.split(" [In Stock")[0]
-            item_row = df_out[df_out["name"] == item_name].iloc[0]
+            item_row = out_by_name.loc[item_name]
             item_id, avail = int(item_row["id"]), item_row["in_stock"]
 
             c1, c2, c3 = st.columns(3)
@@ -306,8 +488,7 @@ with tab_out:
             txn_date = c3.date_input("Date", value=date.today())
 
             c4, c5, c6 = st.columns(3)
-            customer_options = list_parties("customer")
-            customer_name_sel = c4.selectbox("Customer (optional)", [""] + customer_options["name"].tolist())
+            customer_name_sel = c4.selectbox("Customer (optional)", [""] + customers_df["name"].tolist())
             customer_new = c5.text_input("Or add new Customer")
             ref_no = c6.text_input("Invoice/Ref No.")
             remarks = st.text_input("Remarks", placeholder="e.g., Sold to walk-in customer")
@@ -324,31 +505,23 @@ with tab_out:
                         txn_date=txn_date.isoformat(), remarks=remarks.strip() or None
                     )
                     st.success("Stock OUT recorded.")
+                    items_df, items_by_name, inv_df, suppliers_df, customers_df = load_shared()
 
 # =============== Inventory & Reports ===============
 with tab_inv:
     st.subheader("Inventory & Reports")
-    inv_df_report = get_inventory_df()
-    if inv_df_report is None or inv_df_report.empty:
+    if inv_df.empty:
         st.info("No inventory yet.")
     else:
         st.dataframe(
-            inv_df_report.rename(columns={"stock_qty":"In Stock", "stock_value_cost":"Stock Value (Cost)"}),
+            paginate(inv_df, "inv_page").rename(columns={"stock_qty":"In Stock", "stock_value_cost":"Stock Value (Cost)"}),
             use_container_width=True,
             hide_index=True
         )
-        st.download_button("Export to CSV", data=inv_df_report.to_csv(index=False), file_name="inventory_export.csv", mime="text/csv")
+        st.download_button("Export to CSV", data=get_inventory_csv(), file_name="inventory_export.csv", mime="text/csv")
 
         st.markdown("#### Transactions (Recent)")
-        con = get_conn()
-        tx = pd.read_sql_query("""
-            SELECT t.txn_date, t.txn_type, i.name AS item, t.qty, t.unit_price, t.ref_no, t.remarks
-            FROM transactions t
-            JOIN items i ON i.id = t.item_id
-            ORDER BY t.created_at DESC
-            LIMIT 200;
-        """, con)
-        con.close()
+        tx = read_sql(SQL_RECENT_TX)
         st.dataframe(tx, use_container_width=True, hide_index=True)
 
 # =============== Parties ===============